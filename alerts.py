@@ -0,0 +1,279 @@
+"""
+Server-side alert engine for MaskGuard.
+
+Per-frame violations are handed to the engine from the detection path and
+turned into debounced events on a background thread. Events are published
+to an in-process event bus (consumed by the SSE endpoint) and appended to a
+rotating on-disk event log.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+
+class EventBus:
+    """
+    In-process publish/subscribe hub. Blocking consumers subscribe() to get
+    their own queue; listeners are callbacks invoked on the publishing thread
+    (used to hand events to an asyncio loop without a thread per client).
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._subscribers = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """Register a new subscriber and return its event queue"""
+        q = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        """Remove a subscriber queue"""
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def add_listener(self, callback):
+        """Call `callback(event)` for every published event - it must not block"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers) + len(self._listeners)
+
+    def publish(self, event):
+        """Deliver an event to all subscribers without ever blocking the publisher"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in event listener: {e}")
+
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow subscriber - drop its oldest event to make room
+                try:
+                    q.get_nowait()
+                    q.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+class AlertEngine:
+    """
+    Debounce per-track violations into alert events.
+
+    A track must stay unsafe for at least `min_duration` seconds before a
+    'violation' event is emitted, and the same track will not raise another
+    event until `cooldown` seconds have passed. The environment-wide
+    'environment_unsafe' / 'environment_safe' events follow the same
+    min-duration rule. Gaps shorter than `grace_period` (missed detections)
+    do not restart a min-duration window or end an unsafe environment.
+    """
+
+    def __init__(self, bus, log_path='logs/alerts.log', min_duration=1.0, cooldown=10.0,
+                 environment_threshold=2, grace_period=0.5, stale_after=3.0,
+                 max_log_bytes=5 * 1024 * 1024, log_backup_count=5):
+        self.bus = bus
+        self.min_duration = min_duration
+        self.cooldown = cooldown
+        self.environment_threshold = environment_threshold
+        self.grace_period = grace_period
+        self.stale_after = stale_after
+
+        self.recent_events = deque(maxlen=50)
+        self._observations = queue.Queue(maxsize=256)
+        self._tracks = {}  # {track_id: {'since': float, 'last_seen': float, 'last_alert': float or None}}
+        self._environment_since = None
+        self._environment_last_unsafe = None
+        self._environment_unsafe = False
+        self._environment_event = None  # Last environment transition, sent to new subscribers
+        self._last_observation = None
+        self._next_event_id = 1
+        self._recent_lock = threading.Lock()
+
+        self._logger = self._create_logger(log_path, max_log_bytes, log_backup_count)
+
+        self._worker = threading.Thread(target=self._run, name='alert-engine', daemon=True)
+        self._worker.start()
+
+    def _create_logger(self, log_path, max_bytes, backup_count):
+        """Create a dedicated logger writing one JSON event per line"""
+        logger = logging.getLogger('maskguard.alerts')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        if log_path and not logger.handlers:
+            try:
+                log_dir = os.path.dirname(log_path)
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+                handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+            except OSError as e:
+                print(f"Error opening alert log {log_path}: {e}")
+        return logger
+
+    def observe(self, unsafe_tracks, unsafe_count):
+        """
+        Record the unsafe tracks seen in one frame.
+        Called on the frame path, so it only enqueues and never blocks.
+        """
+        try:
+            self._observations.put_nowait(('frame', time.time(), unsafe_tracks, unsafe_count))
+        except queue.Full:
+            pass
+
+    def reset(self):
+        """Forget all per-track and environment state"""
+        try:
+            self._observations.put_nowait(('reset', time.time(), None, 0))
+        except queue.Full:
+            pass
+
+    def get_recent_events(self):
+        with self._recent_lock:
+            return list(self.recent_events)
+
+    def catch_up(self, last_event_id=None):
+        """
+        Events for a (re)connecting subscriber: recent events it missed after
+        `last_event_id`, followed by an 'environment_state' event carrying the
+        current environment condition.
+        """
+        with self._recent_lock:
+            missed = []
+            if last_event_id is not None:
+                missed = [event for event in self.recent_events if event['id'] > last_event_id]
+            environment = self._environment_event
+            state = {
+                'id': self._next_event_id - 1,
+                'type': 'environment_state',
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'environment_unsafe': environment is not None and environment['type'] == 'environment_unsafe',
+                'unsafe_count': environment['unsafe_count'] if environment else 0,
+            }
+        return missed + [state]
+
+    def _run(self):
+        while True:
+            try:
+                kind, timestamp, unsafe_tracks, unsafe_count = self._observations.get(timeout=1)
+            except queue.Empty:
+                # No frames arriving (stream paused or closed) - treat as all clear
+                now = time.time()
+                if self._last_observation is not None and now - self._last_observation > self.stale_after:
+                    self._process(now, {}, 0)
+                    self._last_observation = None
+                continue
+
+            try:
+                if kind == 'reset':
+                    self._tracks.clear()
+                    self._environment_since = None
+                    self._environment_last_unsafe = None
+                    self._last_observation = None
+                    if self._environment_unsafe:
+                        # Let every subscriber stop its environment alarm
+                        self._environment_unsafe = False
+                        self._emit('environment_safe', timestamp, unsafe_count=0)
+                else:
+                    self._last_observation = timestamp
+                    self._process(timestamp, unsafe_tracks, unsafe_count)
+            except Exception as e:
+                print(f"Error in alert engine: {e}")
+
+    def _process(self, now, unsafe_tracks, unsafe_count):
+        # Per-track violations
+        for track_id, status_text in unsafe_tracks.items():
+            state = self._tracks.get(track_id)
+            if state is None or state['since'] is None:
+                last_alert = state['last_alert'] if state else None
+                state = {'since': now, 'last_seen': now, 'last_alert': last_alert}
+                self._tracks[track_id] = state
+            state['last_seen'] = now
+
+            duration = now - state['since']
+            cooling_down = state['last_alert'] is not None and now - state['last_alert'] < self.cooldown
+            if duration >= self.min_duration and not cooling_down:
+                state['last_alert'] = now
+                self._emit('violation', now, track_id=track_id, status=status_text,
+                           duration=round(duration, 2), unsafe_count=unsafe_count)
+
+        # Tracks that have not been unsafe for longer than the grace period restart
+        # their min-duration window; they are forgotten once their cooldown has expired
+        for track_id in list(self._tracks.keys()):
+            if track_id in unsafe_tracks:
+                continue
+            state = self._tracks[track_id]
+            if now - state['last_seen'] <= self.grace_period:
+                continue
+            state['since'] = None
+            if state['last_alert'] is None or now - state['last_alert'] >= self.cooldown:
+                del self._tracks[track_id]
+
+        # Environment-wide condition
+        if unsafe_count > self.environment_threshold:
+            if self._environment_since is None:
+                self._environment_since = now
+            self._environment_last_unsafe = now
+            if not self._environment_unsafe and now - self._environment_since >= self.min_duration:
+                self._environment_unsafe = True
+                self._emit('environment_unsafe', now, unsafe_count=unsafe_count)
+        elif self._environment_last_unsafe is None or now - self._environment_last_unsafe > self.grace_period:
+            self._environment_since = None
+            self._environment_last_unsafe = None
+            if self._environment_unsafe:
+                self._environment_unsafe = False
+                self._emit('environment_safe', now, unsafe_count=unsafe_count)
+
+    def _emit(self, event_type, timestamp, **fields):
+        with self._recent_lock:
+            event = {
+                'id': self._next_event_id,
+                'type': event_type,
+                'timestamp': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            event.update(fields)
+            self._next_event_id += 1
+            self.recent_events.append(event)
+            if event_type in ('environment_unsafe', 'environment_safe'):
+                self._environment_event = event
+        self.bus.publish(event)
+        self._logger.info(json.dumps(event))
+
+
+def format_sse(event):
+    """Format an event as a Server-Sent Events message"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def parse_last_event_id(value):
+    """Parse an SSE Last-Event-ID header, or None if it is missing or invalid"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
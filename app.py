@@ -1,15 +1,19 @@
-from flask import Flask, render_template, Response, jsonify, request
+from flask import Flask, render_template, Response, jsonify, request, g, send_from_directory, url_for
 from ultralytics import YOLO
 import cv2
 import threading
 import time
-from collections import deque
 from datetime import datetime
 import numpy as np
 import base64
-import io
-from PIL import Image
+import hmac
+import queue
 import os
+from alerts import EventBus, AlertEngine, format_sse, parse_last_event_id
+from profiler import SamplingProfiler, RequestTracer
+from buffers import BufferPool
+from stats_backend import create_statistics_backend
+from reports import ReportAggregator, ReportExporter, DEFAULT_SHIFTS, parse_time
 
 app = Flask(__name__)
 
@@ -20,21 +24,56 @@ model = YOLO("models/best.onnx", task='detect')
 camera = None
 detection_active = True
 detection_paused = False
+# Live state of this server - counters and detection history live in stats_backend
 statistics = {
-    'total_detections': 0,
-    'with_mask': 0,
-    'without_mask': 0,
-    'incorrect_mask': 0,
     'current_status': 'safe',
-    'last_violation': None,
-    'detection_history': deque(maxlen=100)  # Keep last 100 detections
+    'last_violation': None
 }
+# Detection counters - in memory by default, or shared between replicas
+# (e.g. MASKGUARD_STATS_BACKEND=sqlite:////shared/stats.db or redis://host:6379/0)
+stats_backend = create_statistics_backend(
+    os.environ.get('MASKGUARD_STATS_BACKEND', 'memory'),
+    flush_interval=float(os.environ.get('MASKGUARD_STATS_FLUSH_INTERVAL', 0.5))
+)
+# Hourly per-camera aggregates behind the /reports API
+report_aggregator = ReportAggregator(
+    os.environ.get('MASKGUARD_REPORTS_DB', 'data/reports.db'),
+    shifts=os.environ.get('MASKGUARD_SHIFTS', DEFAULT_SHIFTS)
+)
+report_exporter = ReportExporter(report_aggregator)
 # Track object IDs and their mask status
-tracked_objects = {}  # {track_id: {'status': 'safe'/'unsafe', 'class_name': str, 'alerted': bool, 'category': str}}
+tracked_objects = {}  # {track_id: {'status': 'safe'/'unsafe', 'class_name': str, 'status_text': str, 'category': str}}
 # Track which IDs have been counted to prevent duplicate counting
 counted_ids = set()  # Set of track IDs that have already been counted in statistics
+# Track IDs already recorded in the reports - never reset, since reports are historical
+# and the tracker keeps its IDs (persist=True) across a statistics reset
+reported_ids = set()
 lock = threading.Lock()
 
+# Preallocated capture buffers for the server-camera streams (/video_feed and the
+# async broadcaster). Browser frames on /process_frame are decoded by cv2.imdecode,
+# which always allocates its output, so they do not come from the pool.
+frame_pool = BufferPool()
+
+# Multipart framing for the MJPEG stream
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_PART_FOOTER = b'\r\n'
+
+# Alert engine - debounces violations into events published to SSE subscribers
+event_bus = EventBus()
+alert_engine = AlertEngine(
+    event_bus,
+    log_path=os.environ.get('MASKGUARD_ALERT_LOG', 'logs/alerts.log'),
+    min_duration=float(os.environ.get('MASKGUARD_ALERT_MIN_DURATION', 1.0)),
+    cooldown=float(os.environ.get('MASKGUARD_ALERT_COOLDOWN', 10.0)),
+    grace_period=float(os.environ.get('MASKGUARD_ALERT_GRACE_PERIOD', 0.5))
+)
+
+# Admin/profiling surface - disabled unless an admin token is configured
+ADMIN_TOKEN = os.environ.get('MASKGUARD_ADMIN_TOKEN')
+sampling_profiler = SamplingProfiler()
+request_tracer = RequestTracer(os.environ.get('MASKGUARD_TRACE_DIR', 'logs/traces'))
+
 def get_camera():
     """Initialize camera if not already done"""
     global camera
@@ -51,20 +90,38 @@ def get_camera():
         print(f"Error initializing camera: {e}")
         return None
 
-def analyze_detection(results):
+def decode_frame(image_data):
+    """Decode a base64 (optionally data-URL) image straight into a BGR frame"""
+    if ',' in image_data:
+        image_data = image_data.split(',', 1)[1]
+    image_bytes = base64.b64decode(image_data)
+    
+    # imdecode reads the encoded bytes in place and returns BGR directly,
+    # so there is no intermediate RGB array or color conversion copy
+    frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError('Could not decode image data')
+    return frame
+
+def analyze_detection(results, camera_id='server'):
     """Analyze detection results and update statistics - count each unique ID only once"""
     global statistics, tracked_objects, counted_ids
     
     with lock:
         current_violations = []
         current_frame_ids = set()
-        new_alerts = []
+        unsafe_tracks = {}  # {track_id: status_text} handed to the alert engine
         unsafe_count = 0  # Count of people not wearing mask correctly in current frame
         
         # Track new unique detections for this frame
+        new_unique_ids = 0
         new_unique_with_mask = 0
         new_unique_without_mask = 0
         new_unique_incorrect_mask = 0
+        # Counter changes for this frame, handed to the statistics backend as deltas
+        count_deltas = {'with_mask': 0, 'without_mask': 0, 'incorrect_mask': 0}
+        # People seen for the first time, by the category they were first seen in (for reports)
+        first_seen = {'with_mask': 0, 'without_mask': 0, 'incorrect_mask': 0}
         
         for result in results:
             if result.boxes is not None and len(result.boxes) > 0:
@@ -103,6 +160,9 @@ def analyze_detection(results):
                         status_text = "Mask OK"
                         detection_category = 'with_mask'
                     
+                    if is_unsafe and track_id is not None:
+                        unsafe_tracks[track_id] = status_text
+                    
                     # Track object status changes
                     if track_id is not None:
                         # Check if this is a NEW unique ID we haven't counted before
@@ -114,13 +174,13 @@ def analyze_detection(results):
                                 'status': 'unsafe' if is_unsafe else 'safe',
                                 'class_name': class_name,
                                 'status_text': status_text,
-                                'alerted': False,
                                 'category': detection_category
                             }
                             
                             # Count this person ONLY ONCE when first detected
                             if is_new_unique_id:
                                 counted_ids.add(track_id)
+                                new_unique_ids += 1
                                 if detection_category == 'with_mask':
                                     new_unique_with_mask += 1
                                 elif detection_category == 'without_mask':
@@ -128,9 +188,10 @@ def analyze_detection(results):
                                 elif detection_category == 'incorrect_mask':
                                     new_unique_incorrect_mask += 1
                             
-                            if is_unsafe:
-                                new_alerts.append(track_id)
-                                tracked_objects[track_id]['alerted'] = True
+                            # Reports count each person once, independent of statistics resets
+                            if track_id not in reported_ids and detection_category in first_seen:
+                                reported_ids.add(track_id)
+                                first_seen[detection_category] += 1
                         else:
                             # Existing tracked object
                             old_status = tracked_objects[track_id]['status']
@@ -140,12 +201,8 @@ def analyze_detection(results):
                             # If the person's mask status category changed, update counts
                             if old_category != detection_category and old_category is not None:
                                 # Decrement the old category
-                                if old_category == 'with_mask':
-                                    statistics['with_mask'] = max(0, statistics['with_mask'] - 1)
-                                elif old_category == 'without_mask':
-                                    statistics['without_mask'] = max(0, statistics['without_mask'] - 1)
-                                elif old_category == 'incorrect_mask':
-                                    statistics['incorrect_mask'] = max(0, statistics['incorrect_mask'] - 1)
+                                if old_category in count_deltas:
+                                    count_deltas[old_category] -= 1
                                 
                                 # Increment the new category
                                 if detection_category == 'with_mask':
@@ -160,14 +217,6 @@ def analyze_detection(results):
                                 tracked_objects[track_id]['class_name'] = class_name
                                 tracked_objects[track_id]['status_text'] = status_text
                                 tracked_objects[track_id]['category'] = detection_category
-                                
-                                if new_status == 'unsafe':
-                                    # Status changed from safe to unsafe - trigger alert
-                                    new_alerts.append(track_id)
-                                    tracked_objects[track_id]['alerted'] = True
-                                else:
-                                    # Status changed from unsafe to safe - reset alert
-                                    tracked_objects[track_id]['alerted'] = False
                             else:
                                 # Update status text and category
                                 tracked_objects[track_id]['status_text'] = status_text
@@ -180,34 +229,141 @@ def analyze_detection(results):
             del tracked_objects[tid]
         
         # Update statistics ONLY for new unique detections
-        if new_unique_with_mask > 0 or new_unique_without_mask > 0 or new_unique_incorrect_mask > 0:
-            statistics['with_mask'] += new_unique_with_mask
-            statistics['without_mask'] += new_unique_without_mask
-            statistics['incorrect_mask'] += new_unique_incorrect_mask
-            statistics['total_detections'] = len(counted_ids)  # Total unique people ever detected
-            
-            # Add to history
-            statistics['detection_history'].append({
-                'timestamp': datetime.now().strftime('%H:%M:%S'),
-                'with_mask': statistics['with_mask'],
-                'without_mask': statistics['without_mask'],
-                'incorrect_mask': statistics['incorrect_mask']
-            })
+        has_new_detections = new_unique_with_mask > 0 or new_unique_without_mask > 0 or new_unique_incorrect_mask > 0
+        count_deltas['with_mask'] += new_unique_with_mask
+        count_deltas['without_mask'] += new_unique_without_mask
+        count_deltas['incorrect_mask'] += new_unique_incorrect_mask
+        count_deltas['total_detections'] = new_unique_ids  # Total unique people ever detected
         
         # Determine current status based on current frame
         alert_data = {
-            'new_alerts': new_alerts,
             'unsafe_count': unsafe_count,
             'environment_unsafe': unsafe_count > 2
         }
         
         if unsafe_count > 0:
             statistics['current_status'] = 'unsafe'
-            statistics['last_violation'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            # Raw timestamp - formatted only when statistics are read
+            statistics['last_violation'] = time.time()
         else:
             statistics['current_status'] = 'safe'
+    
+    # Counter deltas are applied (or queued for a shared flush) without touching the network
+    if any(count_deltas.values()):
+        stats_backend.add(count_deltas, record_history=has_new_detections)
+    
+    # Report aggregates are updated incrementally, one cheap in-memory add per frame.
+    # Reports count each person once; category changes only adjust the live counters
+    report_aggregator.record(camera_id, first_seen['with_mask'], first_seen['without_mask'],
+                             first_seen['incorrect_mask'], unsafe_count > 0)
+    
+    # Debouncing and event delivery happen on the alert engine thread
+    alert_engine.observe(unsafe_tracks, unsafe_count)
+    
+    return alert_data
+
+def acquire_camera_frame(cam):
+    """Get a pooled buffer matching the camera's frame size"""
+    height = int(cam.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+    width = int(cam.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+    return frame_pool.acquire((height, width, 3))
+
+def process_camera_frame(cam, frame):
+    """
+    Read one camera frame into `frame`, run tracking, annotate it in place and
+    encode it as an MJPEG part. Returns (frame, part); part is None when no
+    frame could be read or encoded.
+    """
+    success, captured = cam.read(frame)
+    if captured is not None and captured is not frame:
+        # Camera delivered a different size - adopt the new buffer
+        frame_pool.release(frame)
+        frame = captured
+    if not success:
+        print("Failed to read frame from camera")
+        return frame, None
+    
+    # Run YOLO tracking (instead of just detection)
+    results = model.track(frame, conf=0.5, iou=0.7, persist=True, verbose=False)
+    
+    # Analyze detections
+    alert_data = analyze_detection(results)
+    
+    # Draw custom bounding boxes with colors based on tracked status.
+    # The captured frame is not needed after tracking, so annotate it in place
+    annotated_frame = frame
+    
+    for result in results:
+        if result.boxes is not None and len(result.boxes) > 0:
+            for box in result.boxes:
+                # Get box coordinates
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                
+                # Get track ID
+                track_id = None
+                if hasattr(box, 'id') and box.id is not None:
+                    track_id = int(box.id[0])
+                
+                # Get confidence
+                conf = float(box.conf[0])
+                
+                # Determine color and label based on tracked status
+                if track_id is not None and track_id in tracked_objects:
+                    obj_info = tracked_objects[track_id]
+                    if obj_info['status'] == 'unsafe':
+                        color = (0, 0, 255)  # Red for unsafe
+                        label = f"ID:{track_id} - {obj_info['status_text']} ⚠ ALERT"
+                    else:
+                        color = (0, 255, 0)  # Green for safe
+                        label = f"ID:{track_id} - {obj_info['status_text']}"
+                else:
+                    # Default for objects without track ID
+                    color = (255, 255, 0)  # Yellow
+                    label = "Detecting..."
+                
+                # Draw bounding box
+                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+                
+                # Draw label background
+                label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+                cv2.rectangle(annotated_frame, 
+                            (x1, y1 - label_size[1] - 10), 
+                            (x1 + label_size[0], y1), 
+                            color, -1)
+                
+                # Draw label text
+                cv2.putText(annotated_frame, label, 
+                          (x1, y1 - 5), 
+                          cv2.FONT_HERSHEY_SIMPLEX, 
+                          0.6, (255, 255, 255), 2)
+    
+    # Draw environment warning if > 2 people unsafe
+    if alert_data['environment_unsafe']:
+        warning_text = "⚠ ENVIRONMENT NOT SAFE ⚠"
+        text_size, _ = cv2.getTextSize(warning_text, cv2.FONT_HERSHEY_SIMPLEX, 1.2, 3)
+        x = (annotated_frame.shape[1] - text_size[0]) // 2
+        y = 50
+        
+        # Draw warning background
+        cv2.rectangle(annotated_frame, 
+                    (x - 10, y - text_size[1] - 10), 
+                    (x + text_size[0] + 10, y + 10), 
+                    (0, 0, 255), -1)
         
-        return alert_data
+        # Draw warning text
+        cv2.putText(annotated_frame, warning_text, 
+                  (x, y), 
+                  cv2.FONT_HERSHEY_SIMPLEX, 
+                  1.2, (255, 255, 255), 3)
+    
+    # Encode frame
+    ret, buffer = cv2.imencode('.jpg', annotated_frame)
+    if not ret:
+        return frame, None
+    
+    # Build the multipart chunk in one copy straight from the encoder's
+    # buffer (no intermediate tobytes() and no repeated concatenation)
+    return frame, b''.join((MJPEG_PART_HEADER, buffer.data, MJPEG_PART_FOOTER))
 
 def generate_frames():
     """Generate video frames with detection"""
@@ -218,6 +374,9 @@ def generate_frames():
         print("Failed to initialize camera")
         return
     
+    # Every frame of this stream is read into (and annotated in) the same pooled buffer
+    frame = acquire_camera_frame(cam)
+    
     try:
         while detection_active:
             if detection_paused:
@@ -225,93 +384,12 @@ def generate_frames():
                 continue
             
             try:
-                success, frame = cam.read()
-                if not success:
-                    print("Failed to read frame from camera")
+                frame, part = process_camera_frame(cam, frame)
+                if part is None:
                     time.sleep(0.1)
                     continue
                 
-                # Run YOLO tracking (instead of just detection)
-                results = model.track(frame, conf=0.5, iou=0.7, persist=True, verbose=False)
-                
-                # Analyze detections
-                alert_data = analyze_detection(results)
-                
-                # Draw custom bounding boxes with colors based on tracked status
-                annotated_frame = frame.copy()
-                
-                for result in results:
-                    if result.boxes is not None and len(result.boxes) > 0:
-                        for box in result.boxes:
-                            # Get box coordinates
-                            x1, y1, x2, y2 = map(int, box.xyxy[0])
-                            
-                            # Get track ID
-                            track_id = None
-                            if hasattr(box, 'id') and box.id is not None:
-                                track_id = int(box.id[0])
-                            
-                            # Get confidence
-                            conf = float(box.conf[0])
-                            
-                            # Determine color and label based on tracked status
-                            if track_id is not None and track_id in tracked_objects:
-                                obj_info = tracked_objects[track_id]
-                                if obj_info['status'] == 'unsafe':
-                                    color = (0, 0, 255)  # Red for unsafe
-                                    label = f"ID:{track_id} - {obj_info['status_text']} ⚠ ALERT"
-                                else:
-                                    color = (0, 255, 0)  # Green for safe
-                                    label = f"ID:{track_id} - {obj_info['status_text']}"
-                            else:
-                                # Default for objects without track ID
-                                color = (255, 255, 0)  # Yellow
-                                label = "Detecting..."
-                            
-                            # Draw bounding box
-                            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                            
-                            # Draw label background
-                            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                            cv2.rectangle(annotated_frame, 
-                                        (x1, y1 - label_size[1] - 10), 
-                                        (x1 + label_size[0], y1), 
-                                        color, -1)
-                            
-                            # Draw label text
-                            cv2.putText(annotated_frame, label, 
-                                      (x1, y1 - 5), 
-                                      cv2.FONT_HERSHEY_SIMPLEX, 
-                                      0.6, (255, 255, 255), 2)
-                
-                # Draw environment warning if > 2 people unsafe
-                if alert_data['environment_unsafe']:
-                    warning_text = "⚠ ENVIRONMENT NOT SAFE ⚠"
-                    text_size, _ = cv2.getTextSize(warning_text, cv2.FONT_HERSHEY_SIMPLEX, 1.2, 3)
-                    x = (annotated_frame.shape[1] - text_size[0]) // 2
-                    y = 50
-                    
-                    # Draw warning background
-                    cv2.rectangle(annotated_frame, 
-                                (x - 10, y - text_size[1] - 10), 
-                                (x + text_size[0] + 10, y + 10), 
-                                (0, 0, 255), -1)
-                    
-                    # Draw warning text
-                    cv2.putText(annotated_frame, warning_text, 
-                              (x, y), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 
-                              1.2, (255, 255, 255), 3)
-                
-                # Encode frame
-                ret, buffer = cv2.imencode('.jpg', annotated_frame)
-                if not ret:
-                    continue
-                    
-                frame_bytes = buffer.tobytes()
-                
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                yield part
                        
             except Exception as e:
                 print(f"Error processing frame: {e}")
@@ -323,6 +401,7 @@ def generate_frames():
     except Exception as e:
         print(f"Error in generate_frames: {e}")
     finally:
+        frame_pool.release(frame)
         print("Video stream ended")
 
 @app.route('/')
@@ -348,7 +427,7 @@ def how_it_works():
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'model_loaded': model is not None})
+    return jsonify({'status': 'ok', 'model_loaded': model is not None, 'buffer_pool': frame_pool.stats()})
 
 @app.route('/process_frame', methods=['POST'])
 def process_frame():
@@ -359,22 +438,18 @@ def process_frame():
         if not data or 'image' not in data:
             return jsonify({'error': 'No image data provided'}), 400
         
-        # Decode base64 image
-        image_data = data['image'].split(',')[1] if ',' in data['image'] else data['image']
-        image_bytes = base64.b64decode(image_data)
-        
-        # Convert to numpy array
-        image = Image.open(io.BytesIO(image_bytes))
-        frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # Decode base64 image into a BGR frame
+        frame = decode_frame(data['image'])
         
         # Run YOLO tracking
         results = model.track(frame, conf=0.5, iou=0.7, persist=True, verbose=False)
         
-        # Analyze detections
-        alert_data = analyze_detection(results)
+        # Analyze detections (browsers identify their camera for per-camera reports)
+        camera_id = str(data.get('camera_id') or 'browser')[:64]
+        alert_data = analyze_detection(results, camera_id)
         
-        # Draw custom bounding boxes
-        annotated_frame = frame.copy()
+        # Draw custom bounding boxes directly on the decoded frame
+        annotated_frame = frame
         
         for result in results:
             if result.boxes is not None and len(result.boxes) > 0:
@@ -460,13 +535,8 @@ def process_image():
         if not data or 'image' not in data:
             return jsonify({'error': 'No image data provided'}), 400
         
-        # Decode base64 image
-        image_data = data['image'].split(',')[1] if ',' in data['image'] else data['image']
-        image_bytes = base64.b64decode(image_data)
-        
-        # Convert to numpy array
-        image = Image.open(io.BytesIO(image_bytes))
-        frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # Decode base64 image into a BGR frame
+        frame = decode_frame(data['image'])
         
         # Run YOLO detection (NOT tracking - just detection)
         results = model(frame, conf=0.5, verbose=False)
@@ -479,8 +549,8 @@ def process_image():
             'total': 0
         }
         
-        # Draw custom bounding boxes
-        annotated_frame = frame.copy()
+        # Draw custom bounding boxes directly on the decoded frame
+        annotated_frame = frame
         
         for result in results:
             if result.boxes is not None and len(result.boxes) > 0:
@@ -599,47 +669,58 @@ def toggle_detection():
         detection_paused = not detection_paused
     return jsonify({'paused': detection_paused})
 
+def build_statistics():
+    """Snapshot served by /statistics, or None if the lock could not be acquired"""
+    # Try to acquire lock with timeout to prevent hanging
+    if not lock.acquire(timeout=1):
+        return None
+    try:
+        # Counters and history (site-wide when a shared backend is configured)
+        stats = stats_backend.snapshot()
+        stats.update(statistics)
+        if stats['last_violation'] is not None:
+            stats['last_violation'] = datetime.fromtimestamp(stats['last_violation']).strftime('%Y-%m-%d %H:%M:%S')
+        
+        # Calculate safety percentage
+        total = stats['with_mask'] + stats['without_mask'] + stats['incorrect_mask']
+        if total > 0:
+            stats['safety_percentage'] = round((stats['with_mask'] / total) * 100, 1)
+        else:
+            stats['safety_percentage'] = 100
+        
+        # Add alert information
+        unsafe_count = sum(1 for obj in tracked_objects.values() if obj['status'] == 'unsafe')
+        stats['unsafe_count'] = unsafe_count
+        stats['environment_unsafe'] = unsafe_count > 2
+        stats['tracked_count'] = len(tracked_objects)
+        
+        return stats
+    finally:
+        lock.release()
+
+# Returned when the statistics lock is busy
+EMPTY_STATISTICS = {
+    'total_detections': 0,
+    'with_mask': 0,
+    'without_mask': 0,
+    'incorrect_mask': 0,
+    'current_status': 'safe',
+    'safety_percentage': 100,
+    'unsafe_count': 0,
+    'environment_unsafe': False,
+    'tracked_count': 0,
+    'detection_history': []
+}
+
 @app.route('/statistics')
 def get_statistics():
     """Get current statistics"""
     try:
-        # Try to acquire lock with timeout to prevent hanging
-        if lock.acquire(timeout=1):
-            try:
-                stats = statistics.copy()
-                # Convert deque to list for JSON serialization
-                stats['detection_history'] = list(stats['detection_history'])
-                
-                # Calculate safety percentage
-                total = stats['with_mask'] + stats['without_mask'] + stats['incorrect_mask']
-                if total > 0:
-                    stats['safety_percentage'] = round((stats['with_mask'] / total) * 100, 1)
-                else:
-                    stats['safety_percentage'] = 100
-                
-                # Add alert information
-                unsafe_count = sum(1 for obj in tracked_objects.values() if obj['status'] == 'unsafe')
-                stats['unsafe_count'] = unsafe_count
-                stats['environment_unsafe'] = unsafe_count > 2
-                stats['tracked_count'] = len(tracked_objects)
-                
-                return jsonify(stats)
-            finally:
-                lock.release()
-        else:
+        stats = build_statistics()
+        if stats is None:
             # If we can't get the lock, return the last known state
-            return jsonify({
-                'total_detections': 0,
-                'with_mask': 0,
-                'without_mask': 0,
-                'incorrect_mask': 0,
-                'current_status': 'safe',
-                'safety_percentage': 100,
-                'unsafe_count': 0,
-                'environment_unsafe': False,
-                'tracked_count': 0,
-                'detection_history': []
-            })
+            return jsonify(EMPTY_STATISTICS)
+        return jsonify(stats)
     except Exception as e:
         print(f"Error in get_statistics: {e}")
         return jsonify({'error': str(e)}), 500
@@ -650,20 +731,163 @@ def reset_statistics():
     global statistics, counted_ids, tracked_objects
     with lock:
         statistics = {
-            'total_detections': 0,
-            'with_mask': 0,
-            'without_mask': 0,
-            'incorrect_mask': 0,
             'current_status': 'safe',
-            'last_violation': None,
-            'detection_history': deque(maxlen=100)
+            'last_violation': None
         }
+        # Resets the shared totals too when a shared backend is configured
+        stats_backend.reset()
         # Clear the counted IDs to allow fresh counting
         counted_ids.clear()
         # Clear tracked objects
         tracked_objects.clear()
+    alert_engine.reset()
     return jsonify({'success': True})
 
+@app.route('/alerts/stream')
+def alerts_stream():
+    """Server-Sent Events stream of debounced alert events"""
+    # Browsers send the last id they saw when they reconnect
+    last_event_id = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    
+    def stream():
+        events = event_bus.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            # Missed events and the current environment state, so a new or
+            # reconnected page starts (or stops) its alarm correctly
+            catch_up = alert_engine.catch_up(last_event_id)
+            sent_id = catch_up[-1]['id']
+            for event in catch_up:
+                yield format_sse(event)
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ': keepalive\n\n'
+                    continue
+                if event['id'] <= sent_id:
+                    # Already delivered by the catch-up
+                    continue
+                yield format_sse(event)
+        except GeneratorExit:
+            pass
+        finally:
+            event_bus.unsubscribe(events)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/alerts/recent')
+def alerts_recent():
+    """Get the most recent alert events"""
+    return jsonify({'events': alert_engine.get_recent_events()})
+
+def parse_report_args():
+    """Read start/end/granularity/camera query parameters (default: today so far)"""
+    now = datetime.now()
+    start = parse_time(request.args.get('start'), now.replace(hour=0, minute=0, second=0, microsecond=0))
+    end = parse_time(request.args.get('end'), now)
+    if end <= start:
+        raise ValueError('end must be after start')
+    return start, end, request.args.get('granularity', 'hour'), request.args.get('camera') or None
+
+def report_response(report):
+    return Response(report['content'], mimetype=report['mimetype'],
+                    headers={'Content-Disposition': f"attachment; filename={report['filename']}"})
+
+@app.route('/reports/summary')
+def report_summary():
+    """Precomputed compliance aggregates for a time range"""
+    try:
+        start, end, granularity, camera_id = parse_report_args()
+        return jsonify(report_aggregator.summary(start, end, granularity, camera_id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/reports/export')
+def report_export():
+    """Export a report as PDF or CSV - rendered by a background worker"""
+    try:
+        start, end, granularity, camera_id = parse_report_args()
+        state, result = report_exporter.request(request.args.get('format', 'pdf'), start, end,
+                                                granularity, camera_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if state == 'ready':
+        return report_response(result)
+    return jsonify({'status': 'pending', 'job_id': result,
+                    'status_url': url_for('report_job', job_id=result)}), 202
+
+@app.route('/reports/jobs/<job_id>')
+def report_job(job_id):
+    """Poll a report render - returns the file once it is done"""
+    job = report_exporter.job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown report job'}), 404
+    if job['status'] == 'pending':
+        return jsonify({'status': 'pending', 'job_id': job_id,
+                        'status_url': url_for('report_job', job_id=job_id)}), 202
+    if job['status'] == 'error':
+        return jsonify({'status': 'error', 'error': job['error']}), 500
+    return report_response(job['report'])
+
+def is_admin_request():
+    """Check the X-Admin-Token header against the configured admin token"""
+    if not ADMIN_TOKEN:
+        return False
+    # Compare bytes - compare_digest rejects non-ASCII str values with TypeError.
+    # WSGI decodes header bytes as latin-1, so encoding back gives the raw bytes sent
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode('latin-1', 'replace'),
+                               ADMIN_TOKEN.encode('utf-8'))
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """Sample all server threads for N seconds and return a collapsed-stack file"""
+    if not is_admin_request():
+        return jsonify({'error': 'Not found'}), 404
+    
+    try:
+        seconds = min(max(float(request.args.get('seconds', 10)), 1), 120)
+        interval = min(max(float(request.args.get('interval_ms', 5)), 1), 100) / 1000
+    except ValueError:
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    
+    collapsed = sampling_profiler.profile(seconds, interval)
+    if collapsed is None:
+        return jsonify({'error': 'A profile is already running'}), 409
+    
+    filename = f"maskguard-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed"
+    return Response(collapsed, mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/admin/traces/<path:filename>')
+def admin_trace(filename):
+    """Download a per-request cProfile trace"""
+    if not is_admin_request():
+        return jsonify({'error': 'Not found'}), 404
+    return send_from_directory(os.path.abspath(request_tracer.trace_dir), filename, as_attachment=True)
+
+def start_request_trace():
+    """Profile this request when an admin sends the X-Profile-Request header"""
+    if request.headers.get('X-Profile-Request') and is_admin_request():
+        g.request_profiler = request_tracer.start()
+
+def finish_request_trace(response):
+    """Write the request profile and point to it from the response headers"""
+    profiler = g.pop('request_profiler', None)
+    if profiler is not None:
+        filename = request_tracer.finish(profiler, request.endpoint or request.path)
+        if filename:
+            response.headers['X-Profile-Trace'] = f'/admin/traces/{filename}'
+    return response
+
+# Hooks are only installed when profiling is enabled, so they cost nothing otherwise
+if ADMIN_TOKEN:
+    app.before_request(start_request_trace)
+    app.after_request(finish_request_trace)
+
 if __name__ == '__main__':
     # Get port from environment variable (for deployment) or use 5000 (for local)
     port = int(os.environ.get('PORT', 5000))
@@ -686,6 +910,9 @@ if __name__ == '__main__':
         print(f"Server error: {e}")
     finally:
         detection_active = False
+        # Push any unflushed counter deltas to the shared store
+        stats_backend.close()
+        report_aggregator.close()
         if camera is not None:
             camera.release()
             cv2.destroyAllWindows()
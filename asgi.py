@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) serving mode for MaskGuard.
+
+Streaming endpoints are served as coroutines fed from shared broadcasters,
+so a passive viewer costs a socket and a small task instead of a worker
+thread:
+
+    /video_feed       MJPEG - one camera/inference loop on a worker thread,
+                      the latest annotated frame fanned out to every viewer
+    /alerts/stream    SSE - alert events pushed from the event bus
+    /ws/statistics    WebSocket - one statistics snapshot per second shared
+                      by every client
+
+Every other route is the unchanged Flask app, run on a thread pool.
+
+Run with:
+    python asgi.py
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+
+import app as maskguard
+from alerts import format_sse, parse_last_event_id
+
+# CPU-bound camera capture and inference run here, off the event loop
+inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+
+# Flask routes (uploads, /process_frame, pages, ...) run on this many threads
+wsgi_application = WSGIMiddleware(maskguard.app, workers=int(os.environ.get('MASKGUARD_WSGI_WORKERS', 8)))
+
+
+class Broadcaster:
+    """
+    Latest-value fan-out to any number of coroutines.
+    Subscribers always receive the newest value; slow ones skip stale values
+    instead of queueing them.
+    """
+
+    def __init__(self):
+        self.subscribers = 0
+        self._loop = None
+        self._value = None
+        self._sequence = 0
+        self._changed = None
+
+    def publish(self, value):
+        """Publish a new value (must be called on the event loop)"""
+        self._value = value
+        self._sequence += 1
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def publish_threadsafe(self, value):
+        """Publish a new value from a worker thread"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.publish, value)
+
+    async def subscribe(self):
+        """Async generator yielding each new value"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._changed = asyncio.Event()
+
+        self.subscribers += 1
+        self.on_subscribe()
+        try:
+            seen = self._sequence
+            while True:
+                if self._sequence == seen:
+                    await self._changed.wait()
+                seen = self._sequence
+                yield self._value
+        finally:
+            self.subscribers -= 1
+
+    def on_subscribe(self):
+        pass
+
+
+class FrameBroadcaster(Broadcaster):
+    """Runs the camera loop on the inference executor while anyone is watching"""
+
+    def __init__(self, executor):
+        super().__init__()
+        self.executor = executor
+        self._producer = None
+
+    def on_subscribe(self):
+        if self._producer is None or self._producer.done():
+            self._producer = self._loop.run_in_executor(self.executor, self._produce)
+            self._producer.add_done_callback(self._producer_stopped)
+
+    def _producer_stopped(self, future):
+        # A viewer may have connected while the producer was shutting down
+        if self.subscribers > 0 and maskguard.detection_active:
+            self.on_subscribe()
+
+    def _produce(self):
+        cam = maskguard.get_camera()
+        if cam is None:
+            print("Failed to initialize camera")
+            time.sleep(1)
+            return
+
+        frame = maskguard.acquire_camera_frame(cam)
+        try:
+            while self.subscribers > 0 and maskguard.detection_active:
+                if maskguard.detection_paused:
+                    time.sleep(0.1)
+                    continue
+                try:
+                    # One inference + encode per frame, shared by every viewer
+                    frame, part = maskguard.process_camera_frame(cam, frame)
+                    if part is None:
+                        time.sleep(0.1)
+                        continue
+                    self.publish_threadsafe(part)
+                except Exception as e:
+                    print(f"Error processing frame: {e}")
+                    time.sleep(0.1)
+        finally:
+            maskguard.frame_pool.release(frame)
+            print("Video broadcast stopped")
+
+
+class StatisticsBroadcaster(Broadcaster):
+    """Computes one statistics snapshot per interval for all WebSocket clients"""
+
+    def __init__(self, interval=1.0):
+        super().__init__()
+        self.interval = interval
+        self._task = None
+
+    def on_subscribe(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._produce())
+
+    async def _produce(self):
+        while self.subscribers > 0:
+            try:
+                # build_statistics may wait on the detection lock - keep it off the loop
+                stats = await self._loop.run_in_executor(None, maskguard.build_statistics)
+                self.publish(json.dumps(stats if stats is not None else maskguard.EMPTY_STATISTICS))
+            except Exception as e:
+                print(f"Error building statistics: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class AlertRelay:
+    """Relays event bus alerts into one asyncio queue per SSE client"""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self._queues = set()
+        self._loop = None
+
+    def _on_event(self, event):
+        # Called on the alert engine thread
+        self._loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event):
+        for q in list(self._queues):
+            if q.full():
+                # Slow client - drop its oldest event to make room
+                q.get_nowait()
+            q.put_nowait(event)
+
+    async def events(self, last_event_id=None):
+        """SSE body for one client"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self.bus.add_listener(self._on_event)
+
+        q = asyncio.Queue(maxsize=100)
+        self._queues.add(q)
+        try:
+            yield b'retry: 3000\n\n'
+            # Missed events and the current environment state
+            catch_up = maskguard.alert_engine.catch_up(last_event_id)
+            sent_id = catch_up[-1]['id']
+            for event in catch_up:
+                yield format_sse(event).encode()
+            while True:
+                try:
+                    event = await asyncio.wait_for(q.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield b': keepalive\n\n'
+                    continue
+                if event['id'] <= sent_id:
+                    # Already delivered by the catch-up
+                    continue
+                yield format_sse(event).encode()
+        finally:
+            self._queues.discard(q)
+
+
+frame_broadcaster = FrameBroadcaster(inference_executor)
+statistics_broadcaster = StatisticsBroadcaster()
+alert_relay = AlertRelay(maskguard.event_bus)
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] in ('http.disconnect', 'websocket.disconnect'):
+            return
+
+
+async def stream_response(receive, send, content_type, chunks):
+    """Send an endless streaming HTTP response until the client goes away"""
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', content_type.encode()),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    async def pump():
+        try:
+            async for chunk in chunks:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            await chunks.aclose()
+
+    pump_task = asyncio.ensure_future(pump())
+    disconnect_task = asyncio.ensure_future(_wait_for_disconnect(receive))
+    done, pending = await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+
+    if pump_task in done and disconnect_task not in done:
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+async def statistics_websocket(receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+
+    async def pump():
+        updates = statistics_broadcaster.subscribe()
+        try:
+            async for payload in updates:
+                await send({'type': 'websocket.send', 'text': payload})
+        finally:
+            await updates.aclose()
+
+    pump_task = asyncio.ensure_future(pump())
+    disconnect_task = asyncio.ensure_future(_wait_for_disconnect(receive))
+    await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (pump_task, disconnect_task):
+        task.cancel()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            maskguard.detection_active = False
+            # Push any unflushed counter deltas and report aggregates
+            maskguard.stats_backend.close()
+            maskguard.report_aggregator.close()
+            inference_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+
+    path = scope.get('path', '')
+    if scope['type'] == 'websocket':
+        if path == '/ws/statistics':
+            await statistics_websocket(receive, send)
+        else:
+            await send({'type': 'websocket.close', 'code': 1000})
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        if path == '/video_feed':
+            await stream_response(receive, send, 'multipart/x-mixed-replace; boundary=frame',
+                                  frame_broadcaster.subscribe())
+            return
+        if path == '/alerts/stream':
+            headers = dict(scope.get('headers', []))
+            last_event_id = parse_last_event_id(headers.get(b'last-event-id', b'').decode('latin-1'))
+            await stream_response(receive, send, 'text/event-stream', alert_relay.events(last_event_id))
+            return
+
+    await wsgi_application(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5000))
+
+    print("=" * 60)
+    print("MaskGuard Detection System - Starting (async mode)...")
+    print("=" * 60)
+    print(f"Server running on: http://0.0.0.0:{port}")
+    print("=" * 60)
+
+    uvicorn.run(application, host='0.0.0.0', port=port)
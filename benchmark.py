@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Benchmark ONNX exports of a trained MaskGuard checkpoint.
+
+Exports the checkpoint at several imgsz/opset/simplify/dynamic settings,
+measures CPU latency and throughput per batch size with the same
+preprocessing app.py uses (640x480 BGR camera frames, letterboxed by
+ultralytics), and writes a comparison table next to the run's accuracy
+metrics (results.csv) so the model shipped as models/best.onnx can be
+picked on measured speed/accuracy trade-offs.
+
+Example:
+    python benchmark.py runs/detect/train/weights/best.pt --imgsz 320 480 640 --opset 12 17
+"""
+
+import argparse
+import csv
+import glob
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Camera resolution requested by app.py's get_camera()
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+
+ACCURACY_COLUMNS = {
+    'precision': 'metrics/precision(B)',
+    'recall': 'metrics/recall(B)',
+    'mAP50': 'metrics/mAP50(B)',
+    'mAP50-95': 'metrics/mAP50-95(B)',
+}
+
+# Ultralytics' fitness - how it picks the epoch saved as best.pt
+FITNESS_WEIGHTS = {'mAP50': 0.1, 'mAP50-95': 0.9}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark ONNX exports of a trained checkpoint')
+    parser.add_argument('checkpoint', help='Trained checkpoint, e.g. runs/detect/train/weights/best.pt')
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[640], help='Export image sizes')
+    parser.add_argument('--opset', type=int, nargs='+', default=[12], help='ONNX opsets')
+    parser.add_argument('--simplify', choices=['on', 'off', 'both'], default='on', help='Run the ONNX simplifier')
+    parser.add_argument('--dynamic', choices=['on', 'off', 'both'], default='both',
+                        help='Dynamic batch axis (static exports are only benchmarked at batch 1)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8], help='Batch sizes to time')
+    parser.add_argument('--runs', type=int, default=50, help='Timed runs per batch size')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed warm-up runs per batch size')
+    parser.add_argument('--threads', type=int, default=0, help='onnxruntime intra-op threads (0 = default)')
+    parser.add_argument('--images', default='val/*.jpg', help='Glob of sample images used as camera frames')
+    parser.add_argument('--data', help='Dataset YAML - if given, each export is also validated for accuracy')
+    parser.add_argument('--run-dir', help='Training run directory with results.csv (default: from checkpoint)')
+    parser.add_argument('--output', help='Where to write benchmark.csv/.md (default: the run directory)')
+    parser.add_argument('--exports', default='exports', help='Where to write the ONNX exports')
+    return parser.parse_args()
+
+
+def find_run_dir(checkpoint):
+    """runs/detect/train/weights/best.pt -> runs/detect/train"""
+    checkpoint = Path(checkpoint).resolve()
+    if checkpoint.parent.name == 'weights':
+        return checkpoint.parent.parent
+    if Path('train/results.csv').exists():
+        return Path('train')
+    return checkpoint.parent
+
+
+def load_training_metrics(run_dir):
+    """Final and best-fitness epoch accuracy from the run's results.csv"""
+    results_file = Path(run_dir) / 'results.csv'
+    if not results_file.exists():
+        print(f"✗ No results.csv in {run_dir} - accuracy columns will be empty")
+        return None
+
+    with open(results_file, newline='') as f:
+        # Older ultralytics versions pad the column names with spaces
+        rows = [{key.strip(): value.strip() for key, value in row.items()} for row in csv.DictReader(f)]
+    if not rows:
+        return None
+
+    def metrics(row):
+        return {name: float(row[column]) for name, column in ACCURACY_COLUMNS.items() if column in row}
+
+    def fitness(row):
+        return sum(weight * float(row.get(ACCURACY_COLUMNS[name], 0)) for name, weight in FITNESS_WEIGHTS.items())
+
+    best = max(rows, key=fitness)
+    return {
+        'final_epoch': int(float(rows[-1]['epoch'])),
+        'final': metrics(rows[-1]),
+        'best_epoch': int(float(best['epoch'])),
+        'best': metrics(best),
+    }
+
+
+def checkpoint_accuracy(checkpoint, training):
+    """Training metrics of the epoch the checkpoint's weights come from, and a label naming it"""
+    if Path(checkpoint).stem == 'last':
+        return training['final'], f"training epoch {training['final_epoch']} (final)"
+    # best.pt, or a copy of it such as models/best.pt
+    return training['best'], f"training epoch {training['best_epoch']} (best fitness)"
+
+
+def load_frames(pattern):
+    """Sample images resized to the camera resolution app.py streams at"""
+    import cv2
+    import numpy as np
+
+    frames = []
+    for path in sorted(glob.glob(pattern)):
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is not None:
+            frames.append(cv2.resize(image, (FRAME_WIDTH, FRAME_HEIGHT)))
+    if not frames:
+        print(f"✗ No images matched {pattern} - using random frames")
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8) for _ in range(8)]
+    return frames
+
+
+def export_variants(args):
+    """Export every requested combination and return their settings and paths"""
+    from ultralytics import YOLO
+
+    choices = {'on': [True], 'off': [False], 'both': [True, False]}
+    # Kept out of the run directory - exports are large and the run may be tracked
+    exports_dir = Path(args.exports)
+    exports_dir.mkdir(parents=True, exist_ok=True)
+
+    variants = []
+    # Ultralytics writes <checkpoint>.onnx next to the checkpoint, which for
+    # models/best.pt is the served models/best.onnx - export from a copy instead
+    with tempfile.TemporaryDirectory() as work_dir:
+        checkpoint = Path(work_dir) / Path(args.checkpoint).name
+        shutil.copy2(args.checkpoint, checkpoint)
+
+        for imgsz in args.imgsz:
+            for opset in args.opset:
+                for simplify in choices[args.simplify]:
+                    for dynamic in choices[args.dynamic]:
+                        name = f"imgsz{imgsz}_opset{opset}{'_simplified' if simplify else ''}{'_dynamic' if dynamic else ''}"
+                        target = exports_dir / f'{name}.onnx'
+                        print(f"Exporting {name}...")
+                        try:
+                            exported = YOLO(str(checkpoint)).export(format='onnx', imgsz=imgsz, opset=opset,
+                                                                    simplify=simplify, dynamic=dynamic)
+                            shutil.move(str(exported), target)
+                        except Exception as e:
+                            print(f"✗ Export {name} failed: {e}")
+                            continue
+                        print(f"✓ Saved {target}")
+                        variants.append({'name': name, 'path': target, 'imgsz': imgsz, 'opset': opset,
+                                         'simplify': simplify, 'dynamic': dynamic})
+    return variants
+
+
+def preprocess(frames, letterbox):
+    """Letterbox BGR frames and build an NCHW float32 batch, as ultralytics does for app.py"""
+    import numpy as np
+
+    batch = np.stack([letterbox(image=frame) for frame in frames])
+    batch = batch[..., ::-1].transpose(0, 3, 1, 2)  # BGR to RGB, BHWC to BCHW
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def benchmark_variant(variant, frames, args):
+    """Time preprocessing + inference for each batch size the export supports"""
+    import onnxruntime as ort
+    from ultralytics.data.augment import LetterBox
+
+    options = ort.SessionOptions()
+    if args.threads:
+        options.intra_op_num_threads = args.threads
+    session = ort.InferenceSession(str(variant['path']), options, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+    letterbox = LetterBox(new_shape=(variant['imgsz'], variant['imgsz']), auto=False, stride=32)
+
+    batch_sizes = args.batch_sizes if variant['dynamic'] else [1]
+    results = []
+    for batch_size in batch_sizes:
+        batch_frames = [frames[i % len(frames)] for i in range(batch_size)]
+        preprocess_times = []
+        latencies = []
+        for run in range(args.warmup + args.runs):
+            start = time.perf_counter()
+            batch = preprocess(batch_frames, letterbox)
+            preprocessed = time.perf_counter()
+            session.run(None, {input_name: batch})
+            finished = time.perf_counter()
+            if run >= args.warmup:
+                preprocess_times.append((preprocessed - start) * 1000)
+                latencies.append((finished - start) * 1000)
+
+        latencies.sort()
+        mean_latency = statistics.mean(latencies)
+        results.append({
+            'batch_size': batch_size,
+            'preprocess_ms': round(statistics.mean(preprocess_times), 2),
+            'latency_mean_ms': round(mean_latency, 2),
+            'latency_p50_ms': round(latencies[len(latencies) // 2], 2),
+            'latency_p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+            'throughput_fps': round(batch_size * 1000 / mean_latency, 1),
+        })
+        print(f"  batch {batch_size}: {mean_latency:.1f} ms, {results[-1]['throughput_fps']} img/s")
+    return results
+
+
+def validate_variant(variant, data):
+    """Measure accuracy of the exported model itself on the dataset"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(str(variant['path']), task='detect').val(data=data, imgsz=variant['imgsz'], batch=1,
+                                                           verbose=False, plots=False)
+    return {'mAP50': round(float(metrics.box.map50), 4), 'mAP50-95': round(float(metrics.box.map), 4)}
+
+
+def write_tables(rows, training, output_dir):
+    """Write benchmark.csv and benchmark.md"""
+    columns = ['model', 'imgsz', 'opset', 'simplify', 'dynamic', 'size_mb', 'batch_size', 'preprocess_ms',
+               'latency_mean_ms', 'latency_p50_ms', 'latency_p95_ms', 'throughput_fps', 'mAP50', 'mAP50-95',
+               'accuracy_source']
+
+    csv_path = Path(output_dir) / 'benchmark.csv'
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    md_path = Path(output_dir) / 'benchmark.md'
+    with open(md_path, 'w') as f:
+        f.write('# ONNX Export Benchmark\n\n')
+        f.write(f"Generated {time.strftime('%Y-%m-%d %H:%M:%S')} on {sys.platform}, CPU execution provider, "
+                f"{FRAME_WIDTH}x{FRAME_HEIGHT} frames. Latency includes preprocessing.\n\n")
+        if training:
+            final, best = training['final'], training['best']
+            f.write(f"Training accuracy (results.csv): final epoch {training['final_epoch']} "
+                    f"mAP50 {final.get('mAP50', 0):.4f}, mAP50-95 {final.get('mAP50-95', 0):.4f}; "
+                    f"best fitness (0.1 mAP50 + 0.9 mAP50-95) epoch {training['best_epoch']} "
+                    f"mAP50 {best.get('mAP50', 0):.4f}, mAP50-95 {best.get('mAP50-95', 0):.4f}\n\n")
+        f.write('| ' + ' | '.join(columns) + ' |\n')
+        f.write('|' + '---|' * len(columns) + '\n')
+        for row in rows:
+            f.write('| ' + ' | '.join(str(row[column]) for column in columns) + ' |\n')
+
+    print(f"✓ Wrote {csv_path}")
+    print(f"✓ Wrote {md_path}")
+
+
+def main():
+    args = parse_args()
+
+    if not Path(args.checkpoint).exists():
+        print(f"✗ Checkpoint not found: {args.checkpoint}")
+        sys.exit(1)
+
+    run_dir = Path(args.run_dir) if args.run_dir else find_run_dir(args.checkpoint)
+    output_dir = Path(args.output) if args.output else run_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 70)
+    print("MaskGuard Export Benchmark")
+    print("=" * 70)
+    print(f"Checkpoint: {args.checkpoint}")
+    print(f"Run directory: {run_dir}")
+    print(f"Output: {output_dir}")
+    print(f"Exports: {args.exports}")
+    print("=" * 70)
+
+    training = load_training_metrics(run_dir)
+    frames = load_frames(args.images)
+    variants = export_variants(args)
+    if not variants:
+        print("✗ No exports succeeded")
+        sys.exit(1)
+
+    rows = []
+    for variant in variants:
+        print(f"\nBenchmarking {variant['name']}...")
+        try:
+            results = benchmark_variant(variant, frames, args)
+            if args.data:
+                accuracy, source = validate_variant(variant, args.data), 'validated'
+            elif training:
+                # Accuracy measured at the training imgsz - other sizes should be validated with --data
+                accuracy, source = checkpoint_accuracy(args.checkpoint, training)
+            else:
+                accuracy, source = {}, 'none'
+        except Exception as e:
+            print(f"✗ Benchmark {variant['name']} failed: {e}")
+            continue
+
+        for result in results:
+            rows.append({
+                'model': variant['name'],
+                'imgsz': variant['imgsz'],
+                'opset': variant['opset'],
+                'simplify': variant['simplify'],
+                'dynamic': variant['dynamic'],
+                'size_mb': round(os.path.getsize(variant['path']) / 1e6, 1),
+                **result,
+                'mAP50': accuracy.get('mAP50', ''),
+                'mAP50-95': accuracy.get('mAP50-95', ''),
+                'accuracy_source': source,
+            })
+
+    if not rows:
+        print("✗ No exports could be benchmarked")
+        sys.exit(1)
+
+    print()
+    write_tables(rows, training, output_dir)
+
+    # The server runs one frame at a time, so batch 1 latency decides what ships
+    single = [row for row in rows if row['batch_size'] == 1]
+    if single:
+        fastest = min(single, key=lambda row: row['latency_mean_ms'])
+        print(f"\nFastest at batch 1: {fastest['model']} ({fastest['latency_mean_ms']} ms)")
+        print(f"To ship it: cp {Path(args.exports) / (fastest['model'] + '.onnx')} models/best.onnx")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Reusable frame buffers for MaskGuard.
+
+Full-size frames are hundreds of kilobytes each, so allocating fresh arrays
+for every frame of every stream shows up as allocator churn and RSS growth.
+BufferPool hands out preallocated numpy arrays keyed by shape and dtype and
+takes them back when a stream is done with them.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class BufferPool:
+    """Bounded pool of reusable numpy arrays keyed by (shape, dtype)"""
+
+    def __init__(self, max_buffers_per_key=4, max_keys=8):
+        self.max_buffers_per_key = max_buffers_per_key
+        self.max_keys = max_keys
+        self._free = OrderedDict()  # {(shape, dtype): [array, ...]} in least-recently-used order
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(shape, dtype):
+        return tuple(shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Get an uninitialised array of the given shape, reusing a pooled one if possible"""
+        key = self._key(shape, dtype)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self._free.move_to_end(key)
+                self.hits += 1
+                return free.pop()
+            self.misses += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, array):
+        """Return an array to the pool; extra buffers beyond the bounds are dropped"""
+        # Only pool arrays that own their memory - views would pin their parent
+        if array is None or array.base is not None or not array.flags.c_contiguous:
+            return
+
+        key = self._key(array.shape, array.dtype)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            self._free.move_to_end(key)
+            if len(free) < self.max_buffers_per_key:
+                free.append(array)
+            while len(self._free) > self.max_keys:
+                self._free.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            pooled = sum(len(free) for free in self._free.values())
+            pooled_bytes = sum(a.nbytes for free in self._free.values() for a in free)
+        return {'hits': self.hits, 'misses': self.misses, 'pooled': pooled, 'pooled_bytes': pooled_bytes}
@@ -0,0 +1,112 @@
+"""
+Runtime profiling for the MaskGuard server.
+
+SamplingProfiler periodically snapshots the Python stack of every running
+thread (request handlers, generate_frames streams, alert engine, ...) and
+aggregates them into the collapsed-stack format understood by flamegraph.pl,
+speedscope and inferno. Nothing runs until a profile is requested, so there
+is no cost while it is off.
+
+RequestTracer wraps a single request in cProfile when asked to via a header
+and writes the result as a .prof file.
+"""
+
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """Statistical profiler over all Python threads, one profile at a time"""
+
+    def __init__(self, max_depth=128):
+        self.max_depth = max_depth
+        self._busy = threading.Lock()
+        self._labels = {}  # code object -> frame label cache
+
+    def is_running(self):
+        return self._busy.locked()
+
+    def profile(self, duration, interval=0.005):
+        """
+        Sample all threads for `duration` seconds.
+        Returns the collapsed-stack text, or None if a profile is already running.
+        """
+        if not self._busy.acquire(blocking=False):
+            return None
+
+        try:
+            samples = Counter()
+            own_ident = threading.get_ident()
+            deadline = time.monotonic() + duration
+
+            while time.monotonic() < deadline:
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_ident:
+                        continue
+                    thread_name = thread_names.get(ident, f'thread-{ident}')
+                    samples[self._collapse(thread_name, frame)] += 1
+                time.sleep(interval)
+
+            return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+        finally:
+            self._labels.clear()
+            self._busy.release()
+
+    def _collapse(self, thread_name, frame):
+        """Turn a frame chain into 'thread;outer;...;inner' (root first)"""
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.append(thread_name.replace(';', ':'))
+        stack.reverse()
+        return ';'.join(stack)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+            self._labels[code] = label
+        return label
+
+
+class RequestTracer:
+    """
+    Deterministic cProfile trace of a single request.
+    Only the handler itself is covered - the body of a streaming response is
+    produced after the handler returns, so use SamplingProfiler for those.
+    """
+
+    def __init__(self, trace_dir='logs/traces'):
+        self.trace_dir = trace_dir
+
+    def start(self):
+        """Start profiling the current thread, or return None if that is not possible"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (Python 3.12+ allows only one)
+            return None
+        return profiler
+
+    def finish(self, profiler, name):
+        """Stop profiling and write the stats file, returning its file name"""
+        profiler.disable()
+
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_') or 'request'
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{threading.get_ident()}.prof"
+        try:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.trace_dir, filename))
+        except OSError as e:
+            print(f"Error writing request trace: {e}")
+            return None
+        return filename
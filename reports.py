@@ -0,0 +1,429 @@
+"""
+Precomputed compliance reports for MaskGuard.
+
+ReportAggregator keeps hourly buckets per camera, updated as frames are
+analyzed and flushed to SQLite in the background, so any report (hour,
+shift or day granularity, over any time range) is a cheap roll-up of a few
+hundred rows rather than a replay of raw detections.
+
+ReportExporter renders those aggregates to CSV or PDF on a background
+worker and caches results for time ranges that can no longer change.
+"""
+
+import csv
+import io
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BUCKET_FIELDS = ('frames', 'violation_frames', 'with_mask', 'without_mask', 'incorrect_mask')
+GRANULARITIES = ('hour', 'shift', 'day')
+DEFAULT_SHIFTS = '06-14,14-22,22-06'
+
+
+def parse_shifts(spec):
+    """Parse 'start-end' hour ranges, e.g. '06-14,14-22,22-06'"""
+    shifts = []
+    for part in spec.split(','):
+        start, end = part.strip().split('-')
+        shifts.append((int(start) % 24, int(end) % 24))
+    return shifts
+
+
+def parse_time(value, default):
+    """
+    Parse an epoch timestamp or ISO date/datetime as naive server local time.
+    Raises ValueError for anything else.
+    """
+    if value is None or value == '':
+        return default
+    try:
+        return datetime.fromtimestamp(float(value))
+    except (OverflowError, OSError):
+        raise ValueError(f'Timestamp out of range: {value}')
+    except ValueError:
+        pass
+
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date/time: {value}')
+    if parsed.tzinfo is not None:
+        # Explicit offsets are converted to local time so they compare with local defaults
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def compliance_rate(bucket):
+    """Percentage of detected people wearing masks correctly, or None without data"""
+    total = bucket['with_mask'] + bucket['without_mask'] + bucket['incorrect_mask']
+    if total == 0:
+        return None
+    return round(bucket['with_mask'] / total * 100, 1)
+
+
+def _empty_bucket():
+    return dict.fromkeys(BUCKET_FIELDS, 0)
+
+
+def _add_bucket(target, source):
+    for field in BUCKET_FIELDS:
+        target[field] += source[field]
+
+
+class ReportAggregator:
+    """Hourly per-camera aggregates, maintained incrementally from the frame path"""
+
+    def __init__(self, db_path='data/reports.db', flush_interval=5.0, shifts=DEFAULT_SHIFTS):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.shifts = parse_shifts(shifts)
+
+        self._lock = threading.Lock()
+        self._pending = {}  # {(camera_id, hour_start): [frames, violation_frames, with, without, incorrect]}
+        self._hour_start = 0
+        self._hour_end = 0
+        self._stop = threading.Event()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS hourly ('
+                'camera_id TEXT NOT NULL, hour_start INTEGER NOT NULL, '
+                'frames INTEGER NOT NULL, violation_frames INTEGER NOT NULL, '
+                'with_mask INTEGER NOT NULL, without_mask INTEGER NOT NULL, incorrect_mask INTEGER NOT NULL, '
+                'PRIMARY KEY (camera_id, hour_start))'
+            )
+
+        self._flusher = threading.Thread(target=self._run, name='report-flush', daemon=True)
+        self._flusher.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def record(self, camera_id, new_with_mask, new_without_mask, new_incorrect_mask, unsafe):
+        """
+        Add one analyzed frame to the current hour's bucket (cheap, no I/O).
+        The mask counts are people first seen in this frame, by category.
+        """
+        now = time.time()
+        with self._lock:
+            if not self._hour_start <= now < self._hour_end:
+                hour = datetime.fromtimestamp(now).replace(minute=0, second=0, microsecond=0)
+                self._hour_start = int(hour.timestamp())
+                self._hour_end = self._hour_start + 3600
+
+            key = (camera_id, self._hour_start)
+            bucket = self._pending.get(key)
+            if bucket is None:
+                bucket = self._pending[key] = [0, 0, 0, 0, 0]
+            bucket[0] += 1
+            if unsafe:
+                bucket[1] += 1
+            bucket[2] += new_with_mask
+            bucket[3] += new_without_mask
+            bucket[4] += new_incorrect_mask
+
+    def current_hour_start(self):
+        """Start of the hour still being written to - earlier hours are final"""
+        return datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    def close(self):
+        self._stop.set()
+        self._flusher.join(timeout=self.flush_interval + 5)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+        self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        if not pending:
+            return
+
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    'INSERT INTO hourly (camera_id, hour_start, frames, violation_frames, '
+                    'with_mask, without_mask, incorrect_mask) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(camera_id, hour_start) DO UPDATE SET '
+                    'frames = frames + excluded.frames, '
+                    'violation_frames = violation_frames + excluded.violation_frames, '
+                    'with_mask = with_mask + excluded.with_mask, '
+                    'without_mask = without_mask + excluded.without_mask, '
+                    'incorrect_mask = incorrect_mask + excluded.incorrect_mask',
+                    [key + tuple(values) for key, values in pending.items()]
+                )
+        except sqlite3.Error as e:
+            print(f"Error flushing report aggregates: {e}")
+            # Merge back so the counts are retried on the next flush
+            with self._lock:
+                for key, values in pending.items():
+                    bucket = self._pending.setdefault(key, [0, 0, 0, 0, 0])
+                    for i, value in enumerate(values):
+                        bucket[i] += value
+
+    def hourly(self, start, end, camera_id=None):
+        """Hourly buckets overlapping [start, end), including unflushed counts"""
+        start_ts = int(start.replace(minute=0, second=0, microsecond=0).timestamp())
+        end_ts = end.timestamp()
+
+        query = ('SELECT camera_id, hour_start, frames, violation_frames, with_mask, without_mask, incorrect_mask '
+                 'FROM hourly WHERE hour_start >= ? AND hour_start < ?')
+        params = [start_ts, end_ts]
+        if camera_id:
+            query += ' AND camera_id = ?'
+            params.append(camera_id)
+
+        buckets = {}
+        with self._connect() as conn:
+            for row in conn.execute(query, params):
+                buckets[(row[0], row[1])] = dict(zip(BUCKET_FIELDS, row[2:]))
+
+        with self._lock:
+            pending = list(self._pending.items())
+        for (cam, hour_start), values in pending:
+            if start_ts <= hour_start < end_ts and (not camera_id or cam == camera_id):
+                bucket = buckets.setdefault((cam, hour_start), _empty_bucket())
+                _add_bucket(bucket, dict(zip(BUCKET_FIELDS, values)))
+
+        return [dict(camera_id=cam, hour_start=hour_start, **bucket)
+                for (cam, hour_start), bucket in sorted(buckets.items(), key=lambda item: item[0][1])]
+
+    def _period(self, hour, granularity):
+        """Map an hour to (period start, label) for the requested granularity"""
+        if granularity == 'day':
+            day = hour.replace(hour=0)
+            return day, day.strftime('%Y-%m-%d')
+
+        if granularity == 'shift':
+            for start_hour, end_hour in self.shifts:
+                if start_hour < end_hour:
+                    in_shift = start_hour <= hour.hour < end_hour
+                else:
+                    in_shift = hour.hour >= start_hour or hour.hour < end_hour
+                if in_shift:
+                    shift_start = hour.replace(hour=start_hour)
+                    if shift_start > hour:
+                        # Early-morning part of an overnight shift that began the day before
+                        shift_start -= timedelta(days=1)
+                    label = f"{shift_start.strftime('%Y-%m-%d')} {start_hour:02d}:00-{end_hour:02d}:00"
+                    return shift_start, label
+
+        return hour, hour.strftime('%Y-%m-%d %H:00')
+
+    def summary(self, start, end, granularity='hour', camera_id=None, peak_count=5):
+        """Roll hourly buckets up into a report"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+        totals = _empty_bucket()
+        periods = OrderedDict()
+        cameras = {}
+        hours = {}
+
+        for row in self.hourly(start, end, camera_id):
+            hour = datetime.fromtimestamp(row['hour_start'])
+            period_start, label = self._period(hour, granularity)
+
+            period = periods.get(period_start)
+            if period is None:
+                period = periods[period_start] = dict(period_start=period_start.isoformat(), label=label,
+                                                      **_empty_bucket())
+            _add_bucket(period, row)
+            _add_bucket(totals, row)
+            _add_bucket(cameras.setdefault(row['camera_id'], _empty_bucket()), row)
+            _add_bucket(hours.setdefault(row['hour_start'], _empty_bucket()), row)
+
+        for bucket in [totals] + list(periods.values()) + list(cameras.values()):
+            bucket['compliance_rate'] = compliance_rate(bucket)
+
+        # Peak violation periods are reported at hour resolution
+        peaks = sorted(hours.items(),
+                       key=lambda item: (item[1]['without_mask'] + item[1]['incorrect_mask'],
+                                         item[1]['violation_frames']),
+                       reverse=True)
+        peak_periods = [
+            dict(label=datetime.fromtimestamp(hour_start).strftime('%Y-%m-%d %H:00'),
+                 violations=bucket['without_mask'] + bucket['incorrect_mask'],
+                 violation_frames=bucket['violation_frames'],
+                 compliance_rate=compliance_rate(bucket))
+            for hour_start, bucket in peaks[:peak_count]
+            if bucket['without_mask'] + bucket['incorrect_mask'] + bucket['violation_frames'] > 0
+        ]
+
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'granularity': granularity,
+            'camera_id': camera_id,
+            'totals': totals,
+            'periods': list(periods.values()),
+            'peak_periods': peak_periods,
+            'cameras': {cam: cameras[cam] for cam in sorted(cameras)}
+        }
+
+
+def render_csv(summary):
+    """Render a report summary as CSV"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    columns = list(BUCKET_FIELDS) + ['compliance_rate']
+
+    writer.writerow(['section', 'key'] + columns)
+    for period in summary['periods']:
+        writer.writerow(['period', period['label']] + [period[c] for c in columns])
+    for camera_id, bucket in summary['cameras'].items():
+        writer.writerow(['camera', camera_id] + [bucket[c] for c in columns])
+    writer.writerow(['total', 'all'] + [summary['totals'][c] for c in columns])
+    return out.getvalue().encode('utf-8')
+
+
+def render_pdf(summary):
+    """Render a report summary as a PDF (matplotlib is installed with ultralytics)"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    totals = summary['totals']
+    rate = totals['compliance_rate']
+    out = io.BytesIO()
+
+    with PdfPages(out) as pdf:
+        # Page 1 - overview and compliance trend
+        fig = Figure(figsize=(8.27, 11.69))
+        fig.text(0.5, 0.95, 'MaskGuard Detection Report', ha='center', fontsize=20, color='#3b82f6')
+        fig.text(0.5, 0.925, f"{summary['start']}  to  {summary['end']}", ha='center', fontsize=10, color='#666666')
+        fig.text(0.5, 0.91, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                 ha='center', fontsize=8, color='#999999')
+
+        lines = [
+            f"With mask: {totals['with_mask']}",
+            f"Without mask: {totals['without_mask']}",
+            f"Incorrect mask: {totals['incorrect_mask']}",
+            f"Frames analyzed: {totals['frames']}  (with violations: {totals['violation_frames']})",
+            f"Compliance: {'n/a' if rate is None else f'{rate}%'}",
+        ]
+        for i, line in enumerate(lines):
+            fig.text(0.1, 0.86 - i * 0.025, line, fontsize=11)
+
+        ax = fig.add_axes([0.1, 0.1, 0.8, 0.55])
+        periods = summary['periods']
+        ax.bar(range(len(periods)), [p['compliance_rate'] or 0 for p in periods], color='#10b981')
+        ax.set_ylim(0, 100)
+        ax.set_ylabel('Compliance (%)')
+        ax.set_title(f"Compliance per {summary['granularity']}")
+        step = max(1, len(periods) // 24)
+        ax.set_xticks(range(0, len(periods), step))
+        ax.set_xticklabels([p['label'] for p in periods][::step], rotation=60, ha='right', fontsize=7)
+        pdf.savefig(fig)
+
+        # Page 2 - peak violation periods and per-camera breakdown
+        fig = Figure(figsize=(8.27, 11.69))
+        fig.text(0.1, 0.94, 'Peak Violation Periods', fontsize=14)
+        peak_rows = [[p['label'], p['violations'], p['violation_frames'],
+                      '-' if p['compliance_rate'] is None else f"{p['compliance_rate']}%"]
+                     for p in summary['peak_periods']] or [['No violations', '', '', '']]
+        ax = fig.add_axes([0.1, 0.62, 0.8, 0.3])
+        ax.axis('off')
+        ax.table(cellText=peak_rows, colLabels=['Hour', 'Violations', 'Violation frames', 'Compliance'],
+                 loc='upper center')
+
+        fig.text(0.1, 0.55, 'Per-Camera Breakdown', fontsize=14)
+        camera_rows = [[cam, b['with_mask'], b['without_mask'], b['incorrect_mask'],
+                        '-' if b['compliance_rate'] is None else f"{b['compliance_rate']}%"]
+                       for cam, b in summary['cameras'].items()] or [['No data', '', '', '', '']]
+        ax = fig.add_axes([0.1, 0.1, 0.8, 0.42])
+        ax.axis('off')
+        ax.table(cellText=camera_rows, colLabels=['Camera', 'With', 'Without', 'Incorrect', 'Compliance'],
+                 loc='upper center')
+        pdf.savefig(fig)
+
+    return out.getvalue()
+
+
+RENDERERS = {
+    'csv': (render_csv, 'text/csv'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+
+
+class ReportExporter:
+    """Render reports on a background worker, caching ranges that can no longer change"""
+
+    def __init__(self, aggregator, max_cached=32, max_jobs=100):
+        self.aggregator = aggregator
+        self.max_cached = max_cached
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-render')
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # {key: report}
+        self._jobs = OrderedDict()  # {job_id: {'status', 'key', 'report', 'error'}}
+
+    def request(self, fmt, start, end, granularity='hour', camera_id=None):
+        """
+        Return ('ready', report) when a cached report exists,
+        otherwise queue a render and return ('pending', job_id).
+        """
+        if fmt not in RENDERERS:
+            raise ValueError(f"format must be one of {', '.join(RENDERERS)}")
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+        key = (fmt, start.isoformat(), end.isoformat(), granularity, camera_id)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return 'ready', self._cache[key]
+
+            # Reuse a render that is already queued for the same report
+            for job_id, job in self._jobs.items():
+                if job['key'] == key and job['status'] == 'pending':
+                    return 'pending', job_id
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {'status': 'pending', 'key': key, 'report': None, 'error': None}
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._render, job_id, key, start, end)
+        return 'pending', job_id
+
+    def job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _render(self, job_id, key, start, end):
+        fmt, _, _, granularity, camera_id = key
+        try:
+            summary = self.aggregator.summary(start, end, granularity, camera_id)
+            renderer, mimetype = RENDERERS[fmt]
+            report = {
+                'content': renderer(summary),
+                'mimetype': mimetype,
+                'filename': f"MaskGuard_Report_{start.strftime('%Y-%m-%d_%H-%M')}_{end.strftime('%Y-%m-%d_%H-%M')}.{fmt}"
+            }
+        except Exception as e:
+            print(f"Error rendering report: {e}")
+            with self._lock:
+                if job_id in self._jobs:
+                    self._jobs[job_id].update(status='error', error=str(e))
+            return
+
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(status='done', report=report)
+            # Ranges ending before the current hour are final, so they can be cached
+            if end <= self.aggregator.current_hour_start():
+                self._cache[key] = report
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
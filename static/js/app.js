@@ -5,8 +5,10 @@ let alarmInterval = null;
 let currentlyAlarming = false;
 let environmentUnsafe = false;
 let speechInterval = null;
-let previousUnsafeCount = 0;
 let cameraHandler = null;
+let alertSource = null;
+let statisticsSocket = null;
+let statisticsSocketOpen = false;
 
 // DOM Elements
 const toggleBtn = document.getElementById('toggleBtn');
@@ -188,11 +190,6 @@ async function initializeCamera() {
                     ctx.drawImage(img, 0, 0);
                 };
                 img.src = result.image;
-                
-                // Handle alert data
-                if (result.alert_data) {
-                    handleAlertData(result.alert_data);
-                }
             }
         });
         
@@ -232,19 +229,42 @@ function hideCameraError() {
     cameraErrorOverlay.style.display = 'none';
 }
 
-function handleAlertData(alertData) {
-    // Handle environment unsafe condition
-    if (alertData.environment_unsafe !== undefined) {
-        handleEnvironmentUnsafe(alertData.environment_unsafe);
+// Subscribe to debounced alert events pushed by the server
+function connectAlertStream() {
+    if (typeof EventSource === 'undefined') {
+        console.warn('Server-Sent Events not supported - alerts disabled');
+        return;
     }
     
-    // Handle individual violations
-    if (alertData.unsafe_count !== undefined) {
-        if (alertData.unsafe_count > previousUnsafeCount && !alertData.environment_unsafe) {
+    alertSource = new EventSource('/alerts/stream');
+    
+    // A single person has been unsafe long enough to raise an alert
+    alertSource.addEventListener('violation', () => {
+        if (!isPaused && !environmentUnsafe) {
             playAlarm();
         }
-        previousUnsafeCount = alertData.unsafe_count;
-    }
+    });
+    
+    alertSource.addEventListener('environment_unsafe', () => {
+        if (!isPaused) {
+            handleEnvironmentUnsafe(true);
+        }
+    });
+    
+    alertSource.addEventListener('environment_safe', () => {
+        handleEnvironmentUnsafe(false);
+    });
+    
+    // Sent on every (re)connect - repairs the alarm state after missed transitions
+    alertSource.addEventListener('environment_state', (event) => {
+        const state = JSON.parse(event.data);
+        handleEnvironmentUnsafe(state.environment_unsafe && !isPaused);
+    });
+    
+    // EventSource reconnects on its own - just log the failure
+    alertSource.onerror = () => {
+        console.warn('Alert stream disconnected, retrying...');
+    };
 }
 
 // Toggle Detection
@@ -293,10 +313,6 @@ toggleBtn.addEventListener('click', async () => {
                         ctx.drawImage(img, 0, 0);
                     };
                     img.src = result.image;
-                    
-                    if (result.alert_data) {
-                        handleAlertData(result.alert_data);
-                    }
                 }
             });
         }
@@ -323,10 +339,6 @@ switchCameraBtn.addEventListener('click', async () => {
                             ctx.drawImage(img, 0, 0);
                         };
                         img.src = result.image;
-                        
-                        if (result.alert_data) {
-                            handleAlertData(result.alert_data);
-                        }
                     }
                 });
             }
@@ -357,7 +369,6 @@ resetBtn.addEventListener('click', async () => {
                 updateEnvironmentStatus('safe', 100);
                 stopAlarm();
                 handleEnvironmentUnsafe(false);
-                previousUnsafeCount = 0;
                 currentlyAlarming = false;
             }
         } catch (error) {
@@ -368,12 +379,44 @@ resetBtn.addEventListener('click', async () => {
 
 // Update Statistics from Server
 async function updateStatistics() {
-    if (isPaused) return;
+    // Statistics are pushed over the WebSocket when the async server is running
+    if (isPaused || statisticsSocketOpen) return;
     
     try {
         const response = await fetch('/statistics');
         const data = await response.json();
-        
+        applyStatistics(data);
+    } catch (error) {
+        console.error('Error fetching statistics:', error);
+    }
+}
+
+// Subscribe to pushed statistics (async server only - polling is the fallback)
+function connectStatisticsSocket() {
+    if (typeof WebSocket === 'undefined') return;
+    
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    statisticsSocket = new WebSocket(`${protocol}//${window.location.host}/ws/statistics`);
+    
+    statisticsSocket.onopen = () => {
+        statisticsSocketOpen = true;
+    };
+    
+    statisticsSocket.onmessage = (event) => {
+        if (!isPaused) {
+            applyStatistics(JSON.parse(event.data));
+        }
+    };
+    
+    // Not available (e.g. running app.py directly) or dropped - keep polling
+    statisticsSocket.onclose = () => {
+        statisticsSocketOpen = false;
+    };
+}
+
+// Update the statistics panel
+function applyStatistics(data) {
+    try {
         // Update detection counts with animation
         updateStatValue(withMaskEl, data.with_mask);
         updateStatValue(withoutMaskEl, data.without_mask);
@@ -392,27 +435,13 @@ async function updateStatistics() {
             lastViolationEl.style.color = 'var(--color-text-secondary)';
         }
         
-        // Handle environment unsafe condition (> 2 people)
-        if (data.environment_unsafe !== undefined) {
-            handleEnvironmentUnsafe(data.environment_unsafe);
-        }
-        
-        // Handle individual violations (play sound once when unsafe count increases)
-        if (data.unsafe_count !== undefined) {
-            if (data.unsafe_count > previousUnsafeCount && !data.environment_unsafe) {
-                // New violation detected, play alert once
-                playAlarm();
-            }
-            previousUnsafeCount = data.unsafe_count;
-        }
-        
         // Reset alarm state when all clear
         if (data.current_status === 'safe' && data.unsafe_count === 0) {
             currentlyAlarming = false;
         }
         
     } catch (error) {
-        console.error('Error fetching statistics:', error);
+        console.error('Error updating statistics:', error);
     }
 }
 
@@ -540,10 +569,14 @@ async function init() {
         audioNotification.addEventListener('click', enableAudio);
     }
     
+    // Alerts are pushed by the server instead of derived from polling
+    connectAlertStream();
+    
     // Initialize camera
     await initializeCamera();
     
-    // Update statistics every 1 second
+    // Prefer pushed statistics, otherwise update every 1 second
+    connectStatisticsSocket();
     setInterval(updateStatistics, 1000);
     
     // Initial statistics fetch
@@ -559,6 +592,12 @@ if (document.readyState === 'loading') {
 
 // Cleanup on page unload
 window.addEventListener('beforeunload', () => {
+    if (alertSource) {
+        alertSource.close();
+    }
+    if (statisticsSocket) {
+        statisticsSocket.close();
+    }
     stopAlarm();
     handleEnvironmentUnsafe(false);
     synth.cancel();
@@ -8,6 +8,7 @@ class CameraHandler {
         this.isProcessing = false;
         this.frameInterval = null;
         this.fps = 10; // Process 10 frames per second
+        this.cameraId = getCameraId();
     }
 
     async start() {
@@ -142,7 +143,7 @@ class CameraHandler {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ image: imageData })
+                body: JSON.stringify({ image: imageData, camera_id: this.cameraId })
             });
 
             if (!response.ok) {
@@ -181,6 +182,21 @@ class CameraHandler {
     }
 }
 
+// Stable per-browser camera ID, used for per-camera reports
+function getCameraId() {
+    try {
+        let cameraId = localStorage.getItem('maskguardCameraId');
+        if (!cameraId) {
+            cameraId = 'browser-' + Math.random().toString(36).slice(2, 10);
+            localStorage.setItem('maskguardCameraId', cameraId);
+        }
+        return cameraId;
+    } catch (error) {
+        // Storage may be unavailable (e.g. private browsing)
+        return 'browser';
+    }
+}
+
 // Check if browser supports camera access
 function isCameraSupported() {
     return !!(navigator.mediaDevices && navigator.mediaDevices.getUserMedia);
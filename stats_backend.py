@@ -0,0 +1,404 @@
+"""
+Statistics backends for MaskGuard.
+
+The detection path only ever hands counter deltas to a backend. The default
+InMemoryStatisticsBackend applies them directly. The shared backends
+(SQLite on a shared volume, or any Redis-protocol server with Lua
+scripting) buffer deltas locally and flush them on a background thread, so
+the frame path never waits on I/O while every replica converges on the
+same site-wide totals within one flush interval.
+
+Pick a backend with create_statistics_backend():
+    memory                      - per-process counters (default)
+    sqlite:///data/stats.db     - SQLite file, relative path
+    sqlite:////shared/stats.db  - SQLite file, absolute path
+    redis://[:password@]host:6379/0
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse, unquote
+
+COUNTERS = ('total_detections', 'with_mask', 'without_mask', 'incorrect_mask')
+HISTORY_LENGTH = 100
+
+
+def _format_history(entries):
+    """Convert stored history entries (raw timestamps) to the API format"""
+    history = []
+    for entry in entries:
+        item = dict(entry)
+        item['timestamp'] = datetime.fromtimestamp(item['timestamp']).strftime('%H:%M:%S')
+        history.append(item)
+    return history
+
+
+class InMemoryStatisticsBackend:
+    """Per-process counters - the original single-server behaviour"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._history = deque(maxlen=HISTORY_LENGTH)
+
+    def add(self, deltas, record_history=False):
+        """Apply counter deltas, optionally recording a history point"""
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counters[name] = max(0, self._counters[name] + delta)
+            if record_history:
+                self._history.append({
+                    'timestamp': time.time(),
+                    'with_mask': self._counters['with_mask'],
+                    'without_mask': self._counters['without_mask'],
+                    'incorrect_mask': self._counters['incorrect_mask']
+                })
+
+    def snapshot(self):
+        """Current totals plus detection history"""
+        with self._lock:
+            stats = dict(self._counters)
+            history = list(self._history)
+        stats['detection_history'] = _format_history(history)
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict.fromkeys(COUNTERS, 0)
+            self._history.clear()
+
+    def close(self):
+        pass
+
+
+class BufferedStatisticsBackend:
+    """
+    Base class for shared backends.
+
+    Deltas accumulate locally and a background thread pushes them to the
+    shared store every `flush_interval` seconds, then reads back the merged
+    totals. Reads combine the last merged totals with the unflushed local
+    deltas, so they never block on the store either. History points are
+    written by the store in the same transaction as the deltas, from the
+    shared totals, so replicas never record stale views. Subclasses implement
+    _store_flush(deltas, history_timestamp) -> (counters, history) and
+    _store_reset(), which always run on the flush thread.
+    """
+
+    def __init__(self, flush_interval=0.5):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = dict.fromkeys(COUNTERS, 0)
+        self._history_timestamp = None  # Time of the latest detection awaiting a history point
+        self._reset_requested = False
+        self._remote_counters = dict.fromkeys(COUNTERS, 0)
+        self._remote_history = []
+        self._stop = threading.Event()
+
+        self._flusher = threading.Thread(target=self._run, name='stats-flush', daemon=True)
+        self._flusher.start()
+
+    def add(self, deltas, record_history=False):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._pending[name] += delta
+            if record_history:
+                # One point per flush, recorded by the store from the shared totals
+                self._history_timestamp = time.time()
+
+    def _merged_counters(self):
+        return {name: max(0, self._remote_counters[name] + self._pending[name]) for name in COUNTERS}
+
+    def snapshot(self):
+        with self._lock:
+            stats = self._merged_counters()
+            history = list(self._remote_history)
+        stats['detection_history'] = _format_history(history)
+        return stats
+
+    def reset(self):
+        """Reset the shared totals for every replica"""
+        with self._lock:
+            self._pending = dict.fromkeys(COUNTERS, 0)
+            self._history_timestamp = None
+            self._remote_counters = dict.fromkeys(COUNTERS, 0)
+            self._remote_history = []
+            self._reset_requested = True
+
+    def close(self):
+        """Flush outstanding deltas and stop the flush thread"""
+        self._stop.set()
+        self._flusher.join(timeout=self.flush_interval * 4 + 1)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush()
+        self._flush()
+
+    def _flush(self):
+        with self._lock:
+            reset = self._reset_requested
+            deltas = {name: delta for name, delta in self._pending.items() if delta}
+            history_timestamp = self._history_timestamp
+            self._reset_requested = False
+            self._pending = dict.fromkeys(COUNTERS, 0)
+            self._history_timestamp = None
+
+        try:
+            if reset:
+                self._store_reset()
+            counters, remote_history = self._store_flush(deltas, history_timestamp)
+        except Exception as e:
+            print(f"Error flushing statistics to {self.__class__.__name__}: {e}")
+            # Put everything back so it is retried on the next flush,
+            # unless a newer reset has made it obsolete
+            with self._lock:
+                if self._reset_requested:
+                    return
+                self._reset_requested = reset
+                for name, delta in deltas.items():
+                    self._pending[name] += delta
+                if self._history_timestamp is None:
+                    self._history_timestamp = history_timestamp
+            return
+
+        with self._lock:
+            if self._reset_requested:
+                # A reset arrived while flushing - keep the zeroed view until it is applied
+                return
+            self._remote_counters = {name: int(counters.get(name, 0)) for name in COUNTERS}
+            self._remote_history = remote_history[-HISTORY_LENGTH:]
+
+    def _store_flush(self, deltas, history_timestamp):
+        raise NotImplementedError
+
+    def _store_reset(self):
+        raise NotImplementedError
+
+
+class SQLiteStatisticsBackend(BufferedStatisticsBackend):
+    """Shared counters in a SQLite file, e.g. on a volume mounted by every replica"""
+
+    def __init__(self, path, flush_interval=0.5):
+        self.path = path
+        self._conn = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        super().__init__(flush_interval)
+
+    def _connect(self):
+        # Created lazily so the connection belongs to the flush thread
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS history ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL NOT NULL, '
+                'with_mask INTEGER NOT NULL, without_mask INTEGER NOT NULL, incorrect_mask INTEGER NOT NULL)'
+            )
+            self._conn = conn
+        return self._conn
+
+    def _store_flush(self, deltas, history_timestamp):
+        conn = self._connect()
+        if deltas or history_timestamp is not None:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Clamp on insert too - the row may have been deleted by another replica's reset
+                conn.executemany(
+                    'INSERT INTO counters (name, value) VALUES (?, MAX(0, ?)) '
+                    'ON CONFLICT(name) DO UPDATE SET value = MAX(0, value + ?)',
+                    [(name, delta, delta) for name, delta in deltas.items()]
+                )
+                if history_timestamp is not None:
+                    # History point from the shared totals, inside the same transaction
+                    conn.execute(
+                        'INSERT INTO history (timestamp, with_mask, without_mask, incorrect_mask) SELECT ?, '
+                        "COALESCE(MAX(CASE WHEN name = 'with_mask' THEN value END), 0), "
+                        "COALESCE(MAX(CASE WHEN name = 'without_mask' THEN value END), 0), "
+                        "COALESCE(MAX(CASE WHEN name = 'incorrect_mask' THEN value END), 0) FROM counters",
+                        (history_timestamp,)
+                    )
+                    conn.execute('DELETE FROM history WHERE id <= (SELECT MAX(id) FROM history) - ?',
+                                 (HISTORY_LENGTH,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+        rows = conn.execute(
+            'SELECT timestamp, with_mask, without_mask, incorrect_mask FROM history ORDER BY id DESC LIMIT ?',
+            (HISTORY_LENGTH,)
+        ).fetchall()
+        remote_history = [
+            {'timestamp': row[0], 'with_mask': row[1], 'without_mask': row[2], 'incorrect_mask': row[3]}
+            for row in reversed(rows)
+        ]
+        return counters, remote_history
+
+    def _store_reset(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM counters')
+        conn.execute('DELETE FROM history')
+        conn.execute('COMMIT')
+
+
+class RespClient:
+    """Minimal Redis-protocol (RESP2) client with pipelining - no external dependency"""
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile('rb')
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            self._send(setup)
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    def pipeline(self, commands):
+        """Send several commands in one round trip and return their replies"""
+        if self._sock is None:
+            self._connect()
+        try:
+            return self._send(commands)
+        except Exception:
+            # Drop the connection so the next call reconnects cleanly
+            self.close()
+            raise
+
+    def _send(self, commands):
+        payload = bytearray()
+        for command in commands:
+            payload += b'*%d\r\n' % len(command)
+            for arg in command:
+                arg = str(arg).encode() if not isinstance(arg, bytes) else arg
+                payload += b'$%d\r\n%s\r\n' % (len(arg), arg)
+        self._sock.sendall(payload)
+        return [self._read_reply() for _ in commands]
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        kind, data = line[:1], line[1:-2]
+        if kind == b'+':
+            return data.decode()
+        if kind == b'-':
+            raise RuntimeError(data.decode())
+        if kind == b':':
+            return int(data)
+        if kind == b'$':
+            length = int(data)
+            if length < 0:
+                return None
+            value = self._reader.read(length + 2)[:-2]
+            return value.decode()
+        if kind == b'*':
+            length = int(data)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise ValueError(f'Unexpected RESP reply: {line!r}')
+
+
+# Applies counter deltas clamped at zero and appends a history point from the
+# resulting totals, atomically on the server.
+# KEYS: counters hash, history list. ARGV: history length, timestamp ('' for
+# no history point), then name/delta pairs.
+FLUSH_SCRIPT = """
+local counters, history = KEYS[1], KEYS[2]
+for i = 3, #ARGV, 2 do
+    if redis.call('HINCRBY', counters, ARGV[i], ARGV[i + 1]) < 0 then
+        redis.call('HSET', counters, ARGV[i], 0)
+    end
+end
+if ARGV[2] ~= '' then
+    local point = {timestamp = tonumber(ARGV[2])}
+    for _, name in ipairs({'with_mask', 'without_mask', 'incorrect_mask'}) do
+        point[name] = tonumber(redis.call('HGET', counters, name) or '0')
+    end
+    redis.call('RPUSH', history, cjson.encode(point))
+    redis.call('LTRIM', history, -tonumber(ARGV[1]), -1)
+end
+return 1
+"""
+
+
+class RedisStatisticsBackend(BufferedStatisticsBackend):
+    """Shared counters in Redis or any server speaking the Redis protocol (with Lua scripting)"""
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, namespace='maskguard',
+                 flush_interval=0.5):
+        self.client = RespClient(host, port, db, password)
+        self.counters_key = f'{namespace}:statistics'
+        self.history_key = f'{namespace}:detection_history'
+        super().__init__(flush_interval)
+
+    def _store_flush(self, deltas, history_timestamp):
+        commands = []
+        if deltas or history_timestamp is not None:
+            args = [HISTORY_LENGTH, '' if history_timestamp is None else repr(history_timestamp)]
+            for name, delta in deltas.items():
+                args += [name, delta]
+            commands.append(('EVAL', FLUSH_SCRIPT, 2, self.counters_key, self.history_key) + tuple(args))
+        commands.append(('HGETALL', self.counters_key))
+        commands.append(('LRANGE', self.history_key, -HISTORY_LENGTH, -1))
+
+        replies = self.client.pipeline(commands)
+        flat_counters, raw_history = replies[-2], replies[-1]
+        counters = dict(zip(flat_counters[::2], flat_counters[1::2]))
+        return counters, [json.loads(item) for item in raw_history]
+
+    def _store_reset(self):
+        self.client.pipeline([('DEL', self.counters_key, self.history_key)])
+
+    def close(self):
+        super().close()
+        self.client.close()
+
+
+def create_statistics_backend(url=None, flush_interval=0.5):
+    """Create a statistics backend from a URL (see module docstring)"""
+    if not url or url == 'memory':
+        return InMemoryStatisticsBackend()
+
+    if url.startswith('sqlite:///'):
+        return SQLiteStatisticsBackend(url[len('sqlite:///'):], flush_interval=flush_interval)
+
+    parsed = urlparse(url)
+    if parsed.scheme == 'redis':
+        db = int(parsed.path.lstrip('/') or 0)
+        password = unquote(parsed.password) if parsed.password else None
+        return RedisStatisticsBackend(parsed.hostname or 'localhost', parsed.port or 6379, db, password,
+                                      flush_interval=flush_interval)
+
+    raise ValueError(f'Unsupported statistics backend: {url}')